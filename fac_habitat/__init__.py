@@ -0,0 +1 @@
+"""Scraping partagé des moniteurs FAC-HABITAT Île-de-France."""
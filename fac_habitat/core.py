@@ -0,0 +1,373 @@
+"""
+Scraping FAC-HABITAT partagé par les points d'entrée.
+
+Liste des résidences IDF, extraction de l'iframe de réservation et
+analyse des disponibilités. La session HTTP, les motifs compilés et les
+caches vivent ici, au niveau du module, pour profiter aux deux scripts.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+import urllib.parse
+
+import aiohttp
+import orjson
+from bs4 import BeautifulSoup, SoupStrainer
+
+# ── Configuration ────────────────────────────────────────────────────────────
+
+BASE_URL = "https://www.fac-habitat.com"
+JSON_URL = f"{BASE_URL}/fr/residences/json"
+RESIDENCE_URL = f"{BASE_URL}/fr/residences-etudiantes/id-{{id}}"
+
+# Codes postaux Île-de-France (75, 77, 78, 91, 92, 93, 94, 95)
+IDF_PREFIXES = ("75", "77", "78", "91", "92", "93", "94", "95")
+_IDF_SET = frozenset(IDF_PREFIXES)
+
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    ),
+    "Accept-Language": "fr-FR,fr;q=0.9",
+}
+
+TIMEOUT = aiohttp.ClientTimeout(total=30)
+
+# Nouvelles tentatives sur erreur réseau (délais 0.3 s, 0.6 s, 1.2 s)
+RETRIES = 3
+BACKOFF = 0.3
+
+# Parseur HTML : lxml (C) si disponible, sinon le parseur pur Python
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# Seules ces balises sont construites par BeautifulSoup (le reste est ignoré)
+IFRAME_STRAINER = SoupStrainer("iframe")
+ROW_STRAINER = SoupStrainer("tr")
+
+# Motifs appliqués à chaque ligne du tableau de réservation
+_RE_TYPE = re.compile(r"T\d")
+_RE_IMMED = re.compile(r"disponibilit[eé]\s*imm[eé]diate", re.IGNORECASE)
+_RE_AUCUNE = re.compile(r"aucune\s*disponibilit[eé]", re.IGNORECASE)
+
+# Nombre de résidences scannées en parallèle (FAC_CONCURRENCY pour ajuster)
+SEM = asyncio.Semaphore(int(os.environ.get("FAC_CONCURRENCY", "10")))
+
+# Horodatage (loop.time()) de la dernière requête envoyée à chaque hôte
+_last_request = {}
+
+# Cache des analyses d'iframe : une page identique au scan précédent n'est pas re-parsée.
+# La version fait partie de la clé : l'incrémenter à chaque modification de
+# parse_availability pour invalider les résultats déjà enregistrés.
+PARSE_CACHE_FILE = "parse_cache.json"
+PARSE_CACHE_VERSION = 2  # 2 : repli texte unifié (DEMANDE_POSSIBLE si bouton "Déposer")
+_parse_cache = {}
+_seen_digests = set()
+
+# Pages résidence -> iframe extraite, avec les validateurs HTTP (ETag /
+# Last-Modified). L'URL d'iframe est stable : pendant IFRAME_TTL, la page
+# résidence n'est même pas redemandée.
+HTTP_CACHE_FILE = "http_cache.json"
+IFRAME_TTL = 7 * 24 * 3600
+_http_cache = {}
+
+# Liste des résidences IDF, rafraîchie une fois par jour (ou avec --force-refresh).
+# Un cache d'une autre version (format des entrées différent) est ignoré.
+RESIDENCES_CACHE = "residences_cache.json"
+RESIDENCES_CACHE_VERSION = 2  # 2 : champ adresse conservé pour toutes les résidences
+RESIDENCES_TTL = 24 * 3600
+
+
+# ── HTTP ─────────────────────────────────────────────────────────────────────
+
+def open_session():
+    """Session HTTP unique : les connexions keep-alive sont réutilisées tout le scan."""
+    connector = aiohttp.TCPConnector(limit=50, limit_per_host=20, ttl_dns_cache=300)
+    return aiohttp.ClientSession(headers=HEADERS, timeout=TIMEOUT, connector=connector)
+
+
+async def fetch(session, url, **kwargs):
+    """GET avec nouvelles tentatives sur les erreurs de connexion et timeouts."""
+    for attempt in range(RETRIES + 1):
+        try:
+            return await session.get(url, **kwargs)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt == RETRIES:
+                raise
+            await asyncio.sleep(BACKOFF * 2 ** attempt)
+
+
+async def polite_delay(url):
+    """Ajoute une courte pause aléatoire si l'hôte a été sollicité il y a < 200 ms."""
+    loop = asyncio.get_running_loop()
+    host = urllib.parse.urlsplit(url).netloc
+    last = _last_request.get(host)
+    if last is not None and loop.time() - last < 0.2:
+        await asyncio.sleep(random.uniform(0.05, 0.15))
+    _last_request[host] = loop.time()
+
+
+# ── Caches ───────────────────────────────────────────────────────────────────
+
+def write_json(path, obj, indent=True):
+    """Écrit du JSON de façon atomique : fichier temporaire puis os.replace."""
+    option = orjson.OPT_INDENT_2 if indent else 0
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(orjson.dumps(obj, option=option))
+    os.replace(tmp, path)
+
+
+def load_residences_cache():
+    """Renvoie la liste IDF en cache si elle est à jour et date de moins de RESIDENCES_TTL."""
+    if not os.path.exists(RESIDENCES_CACHE):
+        return None
+    with open(RESIDENCES_CACHE, "r") as f:
+        cache = json.load(f)
+    if cache.get("version") != RESIDENCES_CACHE_VERSION:
+        return None
+    if time.time() - cache.get("fetched_at", 0) >= RESIDENCES_TTL:
+        return None
+    return cache["data"]
+
+
+def save_residences_cache(idf):
+    write_json(RESIDENCES_CACHE, {
+        "version": RESIDENCES_CACHE_VERSION,
+        "fetched_at": time.time(),
+        "data": idf,
+    })
+
+
+def load_caches():
+    """Charge le cache des analyses d'iframe et les validateurs HTTP."""
+    if os.path.exists(PARSE_CACHE_FILE):
+        with open(PARSE_CACHE_FILE, "r") as f:
+            _parse_cache.update(json.load(f))
+    if os.path.exists(HTTP_CACHE_FILE):
+        with open(HTTP_CACHE_FILE, "r") as f:
+            _http_cache.update(json.load(f))
+
+
+def save_caches():
+    """Sauvegarde les caches ; celui des analyses est réduit aux pages du dernier scan."""
+    # Ordre trié : le fichier versionné ne change que si son contenu change
+    kept = {d: _parse_cache[d] for d in sorted(_seen_digests) if d in _parse_cache}
+    _parse_cache.clear()
+    _parse_cache.update(kept)
+    _seen_digests.clear()
+    write_json(PARSE_CACHE_FILE, kept, indent=False)
+    write_json(HTTP_CACHE_FILE, _http_cache)
+
+
+# ── Scraping ─────────────────────────────────────────────────────────────────
+
+async def get_idf_residences(session, force_refresh=False):
+    """Récupère la liste des résidences IDF depuis l'API JSON (ou le cache)."""
+    if not force_refresh:
+        cached = load_residences_cache()
+        if cached is not None:
+            return cached
+
+    async with await fetch(session, JSON_URL) as resp:
+        resp.raise_for_status()
+        data = orjson.loads(await resp.read())
+
+    idf = []
+    for rid, info in data.items():
+        cp = info.get("cp", "")
+        if cp[:2] in _IDF_SET:
+            idf.append({
+                "id": rid,
+                "nom": info.get("titre", info.get("titre_fr", f"Résidence {rid}")),
+                "ville": info.get("ville", "?"),
+                "cp": cp,
+                "adresse": info.get("adresse", ""),
+            })
+
+    idf.sort(key=lambda r: (r["cp"], r["nom"]))
+    save_residences_cache(idf)
+    return idf
+
+
+def cached_iframe_url(residence_id):
+    """Renvoie l'URL d'iframe en cache si elle a été vérifiée il y a moins de IFRAME_TTL."""
+    cached = _http_cache.get(RESIDENCE_URL.format(id=residence_id))
+    if cached and cached.get("iframe_src") and time.time() - cached.get("checked_at", 0) < IFRAME_TTL:
+        return cached["iframe_src"]
+    return None
+
+
+async def fetch_iframe_url(session, residence_id, use_cache=True):
+    """Récupère l'URL de l'iframe de réservation depuis la page de la résidence."""
+    url = RESIDENCE_URL.format(id=residence_id)
+    cached = _http_cache.get(url) if use_cache else None
+
+    # GET conditionnel : un 304 permet de réutiliser l'iframe déjà extraite
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    await polite_delay(url)
+    async with await fetch(session, url, headers=headers, allow_redirects=True) as resp:
+        if resp.status == 304 and cached:
+            cached["checked_at"] = time.time()
+            return cached["iframe_src"]
+        resp.raise_for_status()
+        text = await resp.text()
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+
+    src = None
+    soup = BeautifulSoup(text, HTML_PARSER, parse_only=IFRAME_STRAINER)
+    iframe = soup.find("iframe", class_="reservation")
+    if iframe and iframe.get("src"):
+        src = iframe["src"]
+        if not src.startswith("http"):
+            src = "https://espacelocataire.fac-habitat.com" + src
+
+    _http_cache[url] = {
+        "etag": etag,
+        "last_modified": last_modified,
+        "iframe_src": src,
+        "checked_at": time.time(),
+    }
+    return src
+
+
+async def check_availability(session, iframe_url):
+    """Télécharge l'iframe et l'analyse dans un thread (sauf si déjà en cache)."""
+    await polite_delay(iframe_url)
+    async with await fetch(session, iframe_url) as resp:
+        resp.raise_for_status()
+        html = await resp.text()
+
+    digest = f"v{PARSE_CACHE_VERSION}-" + hashlib.sha256(html.encode("utf-8")).hexdigest()
+    _seen_digests.add(digest)
+    cached = _parse_cache.get(digest)
+    if cached is not None:
+        return cached
+
+    results = await asyncio.to_thread(parse_availability, html)
+    _parse_cache[digest] = results
+    return results
+
+
+def parse_availability(html):
+    """
+    Analyse le contenu de l'iframe pour détecter les disponibilités.
+    Retourne une liste de dict avec les infos par type de logement.
+    """
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=ROW_STRAINER)
+
+    results = []
+
+    # Chercher toutes les lignes du tableau de réservation
+    for row in soup.find_all("tr"):
+        # Extraire le type de logement (T1, T1 Bis, T2, etc.) ; les lignes
+        # d'en-tête sont écartées avant de collecter toutes les cellules
+        first = row.find("td")
+        if first is None:
+            continue
+        type_cell = first.get_text(strip=True)
+        if not _RE_TYPE.match(type_cell):
+            continue
+
+        cols = row.find_all("td")
+        if len(cols) < 2:
+            continue
+
+        # Extraire le loyer
+        loyer = cols[1].get_text(strip=True) if len(cols) > 1 else ""
+        surface = cols[2].get_text(strip=True) if len(cols) > 2 else ""
+
+        # Vérifier la dernière colonne pour la disponibilité
+        last_col = cols[-1]
+        last_col_text = last_col.get_text(" ", strip=True)
+
+        has_btn = last_col.find("a", class_="btn_reserver") is not None
+        has_dispo_immed = bool(_RE_IMMED.search(last_col_text))
+
+        dispo_span = last_col.find("span", class_="dispo")
+        is_green = False
+        if dispo_span:
+            is_green = "green" in dispo_span.get("class", [])
+
+        has_aucune = bool(_RE_AUCUNE.search(last_col_text))
+
+        # Déterminer le statut
+        if has_dispo_immed or is_green:
+            status = "DISPONIBLE"
+        elif has_btn and not has_aucune:
+            status = "DEPOSER_DEMANDE"
+        elif has_btn and has_aucune:
+            status = "DEMANDE_POSSIBLE"
+        else:
+            status = "INDISPONIBLE"
+
+        results.append({
+            "type": type_cell,
+            "loyer": loyer,
+            "surface": surface,
+            "status": status,
+        })
+
+    # Fallback : chercher directement dans le HTML brut
+    if not results:
+        html_lower = html.lower()
+        has_deposer = "poser une demande" in html_lower or "btn_reserver" in html
+        has_immed = "immédiate" in html or "imm&eacute;diate" in html
+        has_aucune = "aucune disponibilit" in html_lower
+
+        if has_immed:
+            results.append({"type": "?", "loyer": "", "surface": "", "status": "DISPONIBLE"})
+        elif has_deposer and not has_aucune:
+            results.append({"type": "?", "loyer": "", "surface": "", "status": "DEPOSER_DEMANDE"})
+        elif has_deposer:
+            results.append({"type": "?", "loyer": "", "surface": "", "status": "DEMANDE_POSSIBLE"})
+
+    return results
+
+
+async def process(res, session):
+    """Scanne une résidence : iframe puis disponibilités (None si pas d'iframe)."""
+    async with SEM:
+        cached_url = cached_iframe_url(res["id"])
+        if cached_url:
+            try:
+                return await check_availability(session, cached_url)
+            except aiohttp.ClientResponseError as e:
+                # L'iframe en cache a pu changer d'URL : la redécouvrir une fois
+                if not 400 <= e.status < 500:
+                    raise
+                fresh_url = await fetch_iframe_url(session, res["id"], use_cache=False)
+                if not fresh_url or fresh_url == cached_url:
+                    raise
+                return await check_availability(session, fresh_url)
+
+        iframe_url = await fetch_iframe_url(session, res["id"])
+        if not iframe_url:
+            return None
+        return await check_availability(session, iframe_url)
+
+
+async def scan(residences, session):
+    """
+    Scanne toutes les résidences en parallèle.
+    Renvoie, dans l'ordre de la liste, les logements trouvés, None (pas
+    d'iframe) ou l'exception levée pour chaque résidence.
+    """
+    tasks = [process(res, session) for res in residences]
+    return await asyncio.gather(*tasks, return_exceptions=True)
@@ -12,34 +12,21 @@ Usage:
 """
 
 import argparse
-import json
-import os
-import re
+import asyncio
 import subprocess
-import sys
-import time
 from datetime import datetime
 
-import requests
-from bs4 import BeautifulSoup
+from fac_habitat.core import (
+    BASE_URL,
+    get_idf_residences,
+    load_caches,
+    open_session,
+    save_caches,
+    scan,
+)
 
 # ── Configuration ────────────────────────────────────────────────────────────
 
-BASE_URL = "https://www.fac-habitat.com"
-JSON_URL = f"{BASE_URL}/fr/residences/json"
-RESIDENCE_URL = f"{BASE_URL}/fr/residences-etudiantes/id-{{id}}"
-
-# Codes postaux Île-de-France (75, 77, 78, 91, 92, 93, 94, 95)
-IDF_PREFIXES = ("75", "77", "78", "91", "92", "93", "94", "95")
-
-HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
-        "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    ),
-    "Accept-Language": "fr-FR,fr;q=0.9",
-}
-
 # Couleurs ANSI
 GREEN = "\033[92m"
 RED = "\033[91m"
@@ -51,128 +38,6 @@ RESET = "\033[0m"
 
 # ── Fonctions utilitaires ────────────────────────────────────────────────────
 
-def get_idf_residences():
-    """Récupère la liste des résidences IDF depuis l'API JSON."""
-    print(f"{CYAN}[*] Récupération de la liste des résidences...{RESET}")
-    resp = requests.get(JSON_URL, headers=HEADERS, timeout=30)
-    resp.raise_for_status()
-    data = resp.json()
-
-    idf = []
-    for rid, info in data.items():
-        cp = info.get("cp", "")
-        if cp.startswith(IDF_PREFIXES):
-            idf.append({
-                "id": rid,
-                "nom": info.get("titre", info.get("titre_fr", f"Résidence {rid}")),
-                "ville": info.get("ville", "?"),
-                "cp": cp,
-                "adresse": info.get("adresse", ""),
-            })
-
-    idf.sort(key=lambda r: (r["cp"], r["nom"]))
-    print(f"{CYAN}[*] {len(idf)} résidences trouvées en Île-de-France{RESET}\n")
-    return idf
-
-
-def get_iframe_url(residence_id):
-    """Récupère l'URL de l'iframe de réservation depuis la page de la résidence."""
-    url = RESIDENCE_URL.format(id=residence_id)
-    resp = requests.get(url, headers=HEADERS, timeout=30, allow_redirects=True)
-    resp.raise_for_status()
-
-    soup = BeautifulSoup(resp.text, "html.parser")
-    iframe = soup.find("iframe", class_="reservation")
-    if iframe and iframe.get("src"):
-        src = iframe["src"]
-        if not src.startswith("http"):
-            src = "https://espacelocataire.fac-habitat.com" + src
-        return src
-    return None
-
-
-def check_availability(iframe_url):
-    """
-    Analyse le contenu de l'iframe pour détecter les disponibilités.
-    Retourne une liste de dict avec les infos par type de logement.
-    """
-    resp = requests.get(iframe_url, headers=HEADERS, timeout=30)
-    resp.raise_for_status()
-    html = resp.text
-    soup = BeautifulSoup(html, "html.parser")
-
-    results = []
-
-    # Chercher toutes les lignes du tableau de réservation
-    rows = soup.find_all("tr")
-    for row in rows:
-        cols = row.find_all("td")
-        if len(cols) < 2:
-            continue
-
-        # Extraire le type de logement (T1, T1 Bis, T2, etc.)
-        type_cell = cols[0].get_text(strip=True)
-        if not re.match(r"T\d", type_cell):
-            continue
-
-        # Extraire le loyer
-        loyer = cols[1].get_text(strip=True) if len(cols) > 1 else ""
-        surface = cols[2].get_text(strip=True) if len(cols) > 2 else ""
-
-        # Vérifier la dernière colonne pour la disponibilité
-        last_col = cols[-1]
-        last_col_text = last_col.get_text(" ", strip=True)
-
-        has_btn = last_col.find("a", class_="btn_reserver") is not None
-        has_dispo_immed = bool(re.search(
-            r"disponibilit[eé]\s*imm[eé]diate", last_col_text, re.IGNORECASE
-        ))
-
-        dispo_span = last_col.find("span", class_="dispo")
-        is_green = False
-        is_red = False
-        if dispo_span:
-            span_classes = dispo_span.get("class", [])
-            is_green = "green" in span_classes
-            is_red = "red" in span_classes
-
-        has_aucune = bool(re.search(
-            r"aucune\s*disponibilit[eé]", last_col_text, re.IGNORECASE
-        ))
-
-        # Déterminer le statut
-        if has_dispo_immed or is_green:
-            status = "DISPONIBLE"
-        elif has_btn and not has_aucune:
-            status = "DEPOSER_DEMANDE"
-        elif has_btn and has_aucune:
-            status = "DEMANDE_POSSIBLE"
-        else:
-            status = "INDISPONIBLE"
-
-        results.append({
-            "type": type_cell,
-            "loyer": loyer,
-            "surface": surface,
-            "status": status,
-        })
-
-    # Fallback : chercher directement dans le HTML brut
-    if not results:
-        has_deposer = "poser une demande" in html.lower() or "btn_reserver" in html
-        has_immed = "immédiate" in html or "imm&eacute;diate" in html
-        has_aucune = "aucune disponibilit" in html.lower() or "aucune disponibilit" in html
-
-        if has_immed:
-            results.append({"type": "?", "loyer": "", "surface": "", "status": "DISPONIBLE"})
-        elif has_deposer and not has_aucune:
-            results.append({"type": "?", "loyer": "", "surface": "", "status": "DEPOSER_DEMANDE"})
-        elif has_deposer:
-            results.append({"type": "?", "loyer": "", "surface": "", "status": "DEMANDE_POSSIBLE"})
-
-    return results
-
-
 def notify_desktop(title, message):
     """Envoie une notification desktop (Linux)."""
     try:
@@ -208,7 +73,7 @@ def format_status(status):
 
 # ── Boucle principale ───────────────────────────────────────────────────────
 
-def scan_all(residences, notify=False):
+async def scan_all(residences, session, notify=False):
     """Scanne toutes les résidences et affiche les résultats."""
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"\n{'='*80}")
@@ -220,43 +85,41 @@ def scan_all(residences, notify=False):
     demande_possible = []
     errors = []
 
-    for i, res in enumerate(residences, 1):
+    outcomes = await scan(residences, session)
+    save_caches()
+
+    for i, (res, outcome) in enumerate(zip(residences, outcomes), 1):
         label = f"{res['nom']} ({res['ville']}, {res['cp']})"
         print(f"  [{i:2d}/{len(residences)}] {label}...", end=" ", flush=True)
 
-        try:
-            iframe_url = get_iframe_url(res["id"])
-            if not iframe_url:
-                print(f"{YELLOW}iframe non trouvée{RESET}")
-                errors.append(label)
-                continue
-
-            results = check_availability(iframe_url)
-
-            if not results:
-                print(f"{RED}✗ Pas de données{RESET}")
-                continue
-
-            statuses = [r["status"] for r in results]
-
-            if "DISPONIBLE" in statuses:
-                print(f"{GREEN}{BOLD}★ DISPO IMMÉDIATE !{RESET}")
-                available.append((res, results))
-            elif "DEPOSER_DEMANDE" in statuses:
-                print(f"{GREEN}● Demande ouverte{RESET}")
-                available.append((res, results))
-            elif "DEMANDE_POSSIBLE" in statuses:
-                print(f"{YELLOW}○ Demande possible{RESET}")
-                demande_possible.append((res, results))
-            else:
-                print(f"{RED}✗{RESET}")
-
-        except Exception as e:
-            print(f"{RED}Erreur: {e}{RESET}")
+        if isinstance(outcome, Exception):
+            print(f"{RED}Erreur: {outcome}{RESET}")
             errors.append(label)
+            continue
+
+        if outcome is None:
+            print(f"{YELLOW}iframe non trouvée{RESET}")
+            errors.append(label)
+            continue
 
-        # Pause pour ne pas surcharger le serveur
-        time.sleep(0.5)
+        results = outcome
+        if not results:
+            print(f"{RED}✗ Pas de données{RESET}")
+            continue
+
+        statuses = [r["status"] for r in results]
+
+        if "DISPONIBLE" in statuses:
+            print(f"{GREEN}{BOLD}★ DISPO IMMÉDIATE !{RESET}")
+            available.append((res, results))
+        elif "DEPOSER_DEMANDE" in statuses:
+            print(f"{GREEN}● Demande ouverte{RESET}")
+            available.append((res, results))
+        elif "DEMANDE_POSSIBLE" in statuses:
+            print(f"{YELLOW}○ Demande possible{RESET}")
+            demande_possible.append((res, results))
+        else:
+            print(f"{RED}✗{RESET}")
 
     # ── Résumé ──
     print(f"\n{'='*80}")
@@ -318,29 +181,42 @@ def main():
         "--list", action="store_true",
         help="Afficher la liste des résidences IDF et quitter"
     )
+    parser.add_argument(
+        "--force-refresh", action="store_true",
+        help="Ignorer le cache de la liste des résidences"
+    )
     args = parser.parse_args()
 
-    residences = get_idf_residences()
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print(f"\n{YELLOW}[*] Arrêt du moniteur.{RESET}")
+
+
+async def run(args):
+    load_caches()
 
-    if args.list:
-        print(f"\n{BOLD}Résidences FAC-HABITAT en Île-de-France ({len(residences)}) :{RESET}\n")
-        for i, r in enumerate(residences, 1):
-            url = f"{BASE_URL}/fr/residences-etudiantes/id-{r['id']}"
-            print(f"  {i:2d}. {r['nom']:30s} {r['ville']:25s} ({r['cp']})  {url}")
-        return
+    async with open_session() as session:
+        print(f"{CYAN}[*] Récupération de la liste des résidences...{RESET}")
+        residences = await get_idf_residences(session, args.force_refresh)
+        print(f"{CYAN}[*] {len(residences)} résidences trouvées en Île-de-France{RESET}\n")
 
-    if args.loop > 0:
-        print(f"{CYAN}[*] Mode boucle : scan toutes les {args.loop} secondes{RESET}")
-        print(f"{CYAN}[*] Appuyez sur Ctrl+C pour arrêter{RESET}\n")
-        try:
+        if args.list:
+            print(f"\n{BOLD}Résidences FAC-HABITAT en Île-de-France ({len(residences)}) :{RESET}\n")
+            for i, r in enumerate(residences, 1):
+                url = f"{BASE_URL}/fr/residences-etudiantes/id-{r['id']}"
+                print(f"  {i:2d}. {r['nom']:30s} {r['ville']:25s} ({r['cp']})  {url}")
+            return
+
+        if args.loop > 0:
+            print(f"{CYAN}[*] Mode boucle : scan toutes les {args.loop} secondes{RESET}")
+            print(f"{CYAN}[*] Appuyez sur Ctrl+C pour arrêter{RESET}\n")
             while True:
-                scan_all(residences, notify=args.notify)
+                await scan_all(residences, session, notify=args.notify)
                 print(f"\n{CYAN}[*] Prochain scan dans {args.loop}s...{RESET}")
-                time.sleep(args.loop)
-        except KeyboardInterrupt:
-            print(f"\n{YELLOW}[*] Arrêt du moniteur.{RESET}")
-    else:
-        scan_all(residences, notify=args.notify)
+                await asyncio.sleep(args.loop)
+        else:
+            await scan_all(residences, session, notify=args.notify)
 
 
 if __name__ == "__main__":
@@ -5,173 +5,106 @@ Tourne via GitHub Actions, envoie des notifications Telegram,
 et génère une page HTML statique pour GitHub Pages.
 """
 
+import argparse
+import asyncio
 import json
 import os
-import re
-import time
-import urllib.request
-import urllib.parse
 from datetime import datetime, timezone
+from pathlib import Path
 
-from bs4 import BeautifulSoup
-import requests
+import aiohttp
 
-# ── Configuration ────────────────────────────────────────────────────────────
-
-BASE_URL = "https://www.fac-habitat.com"
-JSON_URL = f"{BASE_URL}/fr/residences/json"
-RESIDENCE_URL = f"{BASE_URL}/fr/residences-etudiantes/id-{{id}}"
+from fac_habitat.core import (
+    BASE_URL,
+    get_idf_residences,
+    load_caches,
+    open_session,
+    save_caches,
+    scan,
+    write_json,
+)
 
-IDF_PREFIXES = ("75", "77", "78", "91", "92", "93", "94", "95")
-
-HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
-        "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    ),
-    "Accept-Language": "fr-FR,fr;q=0.9",
-}
+# ── Configuration ────────────────────────────────────────────────────────────
 
 # Telegram (via variables d'environnement GitHub Secrets)
 TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN", "")
 TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID", "")
 
-# Fichier pour éviter les notifications en doublon
-STATE_FILE = "last_state.json"
-
-
-# ── Scraping ─────────────────────────────────────────────────────────────────
-
-def get_idf_residences():
-    """Récupère la liste des résidences IDF depuis l'API JSON."""
-    resp = requests.get(JSON_URL, headers=HEADERS, timeout=30)
-    resp.raise_for_status()
-    data = resp.json()
-
-    idf = []
-    for rid, info in data.items():
-        cp = info.get("cp", "")
-        nom = info.get("titre", info.get("titre_fr", ""))
-        if cp.startswith(IDF_PREFIXES) and "logifac" not in nom.lower():
-            idf.append({
-                "id": rid,
-                "nom": info.get("titre", info.get("titre_fr", f"Résidence {rid}")),
-                "ville": info.get("ville", "?"),
-                "cp": cp,
-            })
-
-    idf.sort(key=lambda r: (r["cp"], r["nom"]))
-    return idf
-
-
-def get_iframe_url(residence_id):
-    """Récupère l'URL de l'iframe de réservation."""
-    url = RESIDENCE_URL.format(id=residence_id)
-    resp = requests.get(url, headers=HEADERS, timeout=30, allow_redirects=True)
-    resp.raise_for_status()
-
-    soup = BeautifulSoup(resp.text, "html.parser")
-    iframe = soup.find("iframe", class_="reservation")
-    if iframe and iframe.get("src"):
-        src = iframe["src"]
-        if not src.startswith("http"):
-            src = "https://espacelocataire.fac-habitat.com" + src
-        return src
-    return None
-
-
-def check_availability(iframe_url):
-    """Analyse l'iframe pour détecter les disponibilités."""
-    resp = requests.get(iframe_url, headers=HEADERS, timeout=30)
-    resp.raise_for_status()
-    html = resp.text
-    soup = BeautifulSoup(html, "html.parser")
-
-    results = []
-    rows = soup.find_all("tr")
-    for row in rows:
-        cols = row.find_all("td")
-        if len(cols) < 2:
-            continue
-
-        type_cell = cols[0].get_text(strip=True)
-        if not re.match(r"T\d", type_cell):
-            continue
-
-        loyer = cols[1].get_text(strip=True) if len(cols) > 1 else ""
-        surface = cols[2].get_text(strip=True) if len(cols) > 2 else ""
-
-        last_col = cols[-1]
-        last_col_text = last_col.get_text(" ", strip=True)
-
-        has_btn = last_col.find("a", class_="btn_reserver") is not None
-        has_dispo_immed = bool(re.search(
-            r"disponibilit[eé]\s*imm[eé]diate", last_col_text, re.IGNORECASE
-        ))
-
-        dispo_span = last_col.find("span", class_="dispo")
-        is_green = False
-        if dispo_span:
-            is_green = "green" in dispo_span.get("class", [])
-
-        has_aucune = bool(re.search(
-            r"aucune\s*disponibilit[eé]", last_col_text, re.IGNORECASE
-        ))
-
-        if has_dispo_immed or is_green:
-            status = "DISPONIBLE"
-        elif has_btn and not has_aucune:
-            status = "DEPOSER_DEMANDE"
-        elif has_btn and has_aucune:
-            status = "DEMANDE_POSSIBLE"
-        else:
-            status = "INDISPONIBLE"
-
-        results.append({
-            "type": type_cell,
-            "loyer": loyer,
-            "surface": surface,
-            "status": status,
-        })
+TELEGRAM_API_URL = "https://api.telegram.org/bot{token}/sendMessage"
+TELEGRAM_TIMEOUT = aiohttp.ClientTimeout(total=10)
 
-    if not results:
-        has_deposer = "poser une demande" in html.lower() or "btn_reserver" in html
-        has_immed = "immédiate" in html or "imm&eacute;diate" in html
-        has_aucune = "aucune disponibilit" in html.lower()
+# Longueur maximale d'un message Telegram
+TELEGRAM_MAX_LENGTH = 4096
 
-        if has_immed:
-            results.append({"type": "?", "loyer": "", "surface": "", "status": "DISPONIBLE"})
-        elif has_deposer and not has_aucune:
-            results.append({"type": "?", "loyer": "", "surface": "", "status": "DEPOSER_DEMANDE"})
-
-    return results
+# Fichier pour éviter les notifications en doublon
+STATE_FILE = "last_state.json"
 
 
 # ── Telegram ─────────────────────────────────────────────────────────────────
 
-def send_telegram(message):
-    """Envoie un message via Telegram Bot API."""
+def format_alert(a):
+    """Formatte une nouvelle disponibilité pour le message Telegram."""
+    status_map = {
+        "DISPONIBLE": ("🟢", "Dispo immédiate"),
+        "DEPOSER_DEMANDE": ("🔵", "Demande ouverte"),
+        "DEMANDE_POSSIBLE": ("🟡", "Demande possible"),
+    }
+    emoji, status_txt = status_map.get(a["status"], ("⚪", a["status"]))
+    prev_map = {
+        "INDISPONIBLE": "Indisponible",
+        "DEMANDE_POSSIBLE": "Demande possible",
+        "DEPOSER_DEMANDE": "Demande ouverte",
+    }
+    prev_txt = prev_map.get(a.get("prev_status", ""), "?")
+    return (
+        f"{emoji} <b>{a['residence']}</b> — {a['ville']}\n"
+        f"   {a['type']} | {a['loyer']}\n"
+        f"   {prev_txt} → <b>{status_txt}</b>\n"
+        f"   <a href=\"{a['url']}\">Voir / Réserver</a>\n\n"
+    )
+
+
+def build_messages(new_availabilities):
+    """Regroupe les alertes (sans doublon) dans le moins de messages possible."""
+    header = "<b>🏠 FAC-HABITAT — Changement détecté !</b>\n\n"
+    blocks = dict.fromkeys(format_alert(a) for a in new_availabilities)
+
+    messages = []
+    current = header
+    for block in blocks:
+        if current != header and len(current) + len(block) > TELEGRAM_MAX_LENGTH:
+            messages.append(current)
+            current = header
+        current += block
+    messages.append(current)
+    return messages
+
+
+async def send_telegram(session, messages):
+    """Envoie les messages via Telegram Bot API, dans l'ordre."""
+    if not messages:
+        return
     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
         print("[TELEGRAM] Token ou Chat ID manquant, notification ignorée.")
         return
 
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    payload = json.dumps({
-        "chat_id": TELEGRAM_CHAT_ID,
-        "text": message,
-        "parse_mode": "HTML",
-        "disable_web_page_preview": True,
-    }).encode("utf-8")
-
-    req = urllib.request.Request(url, data=payload, headers={"Content-Type": "application/json"})
-    try:
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            if resp.status == 200:
-                print("[TELEGRAM] Message envoyé !")
-            else:
-                print(f"[TELEGRAM] Erreur: {resp.status}")
-    except Exception as e:
-        print(f"[TELEGRAM] Erreur d'envoi: {e}")
+    url = TELEGRAM_API_URL.format(token=TELEGRAM_BOT_TOKEN)
+    for message in messages:
+        payload = {
+            "chat_id": TELEGRAM_CHAT_ID,
+            "text": message,
+            "parse_mode": "HTML",
+            "disable_web_page_preview": True,
+        }
+
+        try:
+            async with session.post(url, json=payload, timeout=TELEGRAM_TIMEOUT) as resp:
+                if resp.status == 200:
+                    print("[TELEGRAM] Message envoyé !")
+                else:
+                    print(f"[TELEGRAM] Erreur: {resp.status}")
+        except Exception as e:
+            print(f"[TELEGRAM] Erreur d'envoi: {e}")
 
 
 # ── État (anti-doublon) ─────────────────────────────────────────────────────
@@ -185,12 +118,39 @@ def load_previous_state():
 
 
 def save_state(state):
-    with open(STATE_FILE, "w") as f:
-        json.dump(state, f, ensure_ascii=False, indent=2)
+    write_json(STATE_FILE, state)
 
 
 # ── Génération HTML ──────────────────────────────────────────────────────────
 
+# En-tête (CSS compris) et pied de page constants, construits une seule fois
+HTML_HEAD = """<!DOCTYPE html>
+<html lang="fr">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>FAC-HABITAT IDF — Disponibilités</title>
+    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css" rel="stylesheet">
+    <style>
+        body { background: #f4f6f9; }
+        .card.border-success { border-width: 3px; }
+        .hero { background: linear-gradient(135deg, #1a8754, #0d6efd); color: white; padding: 2rem 0; }
+        .badge { font-size: 0.8rem; }
+        .stats { font-size: 1.3rem; font-weight: 600; }
+    </style>
+</head>
+<body>"""
+
+HTML_FOOTER = """
+    </div>
+
+    <footer class="text-center text-muted py-4">
+        <small>Mise à jour automatique toutes les 10 minutes via GitHub Actions.</small>
+    </footer>
+</body>
+</html>"""
+
+
 def generate_html(all_results, scan_time):
     """Génère une page HTML statique avec les résultats."""
 
@@ -211,7 +171,7 @@ def generate_html(all_results, scan_time):
 
     def render_card(res, logements, card_class):
         url = f"{BASE_URL}/fr/residences-etudiantes/id-{res['id']}"
-        rows = ""
+        parts = []
         for l in logements:
             badge = {
                 "DISPONIBLE": '<span class="badge bg-success">Disponibilité immédiate</span>',
@@ -219,12 +179,13 @@ def generate_html(all_results, scan_time):
                 "DEMANDE_POSSIBLE": '<span class="badge bg-warning text-dark">Demande possible</span>',
                 "INDISPONIBLE": '<span class="badge bg-secondary">Indisponible</span>',
             }.get(l["status"], "")
-            rows += f"""<tr>
+            parts.append(f"""<tr>
                 <td>{l['type']}</td>
                 <td>{l['loyer']}</td>
                 <td>{l['surface']}</td>
                 <td>{badge}</td>
-            </tr>"""
+            </tr>""")
+        rows = "".join(parts)
 
         return f"""
         <div class="col-md-6 col-lg-4 mb-4">
@@ -241,26 +202,19 @@ def generate_html(all_results, scan_time):
             </div>
         </div>"""
 
-    dispo_cards = "".join(render_card(r, l, "border-success") for r, l in disponibles)
-    demande_cards = "".join(render_card(r, l, "border-primary") for r, l in demandes)
-    indispo_cards = "".join(render_card(r, l, "border-secondary") for r, l in indisponibles)
-
-    html = f"""<!DOCTYPE html>
-<html lang="fr">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>FAC-HABITAT IDF — Disponibilités</title>
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css" rel="stylesheet">
-    <style>
-        body {{ background: #f4f6f9; }}
-        .card.border-success {{ border-width: 3px; }}
-        .hero {{ background: linear-gradient(135deg, #1a8754, #0d6efd); color: white; padding: 2rem 0; }}
-        .badge {{ font-size: 0.8rem; }}
-        .stats {{ font-size: 1.3rem; font-weight: 600; }}
-    </style>
-</head>
-<body>
+    sections = [
+        ("<h2 class='text-success mb-3'>Disponibilité immédiate</h2>", disponibles, "border-success"),
+        ("<h2 class='text-primary mb-3 mt-4'>Demande ouverte</h2>", demandes, "border-primary"),
+        ("<h2 class='text-secondary mb-3 mt-4'>Indisponible</h2>", indisponibles, "border-secondary"),
+    ]
+    body_parts = []
+    for title, group, card_class in sections:
+        if group:
+            cards = "".join([render_card(r, l, card_class) for r, l in group])
+            body_parts.append(f"        {title}<div class='row'>{cards}</div>")
+    body = "\n".join(body_parts)
+
+    hero = f"""
     <div class="hero text-center">
         <div class="container">
             <h1>FAC-HABITAT Île-de-France</h1>
@@ -275,46 +229,54 @@ def generate_html(all_results, scan_time):
     </div>
 
     <div class="container mt-4">
-        {"<h2 class='text-success mb-3'>Disponibilité immédiate</h2><div class='row'>" + dispo_cards + "</div>" if disponibles else ""}
-        {"<h2 class='text-primary mb-3 mt-4'>Demande ouverte</h2><div class='row'>" + demande_cards + "</div>" if demandes else ""}
-        {"<h2 class='text-secondary mb-3 mt-4'>Indisponible</h2><div class='row'>" + indispo_cards + "</div>" if indisponibles else ""}
-    </div>
+"""
+    return "".join([HTML_HEAD, hero, body, HTML_FOOTER])
 
-    <footer class="text-center text-muted py-4">
-        <small>Mise à jour automatique toutes les 10 minutes via GitHub Actions.</small>
-    </footer>
-</body>
-</html>"""
-    return html
+
+def write_html(html):
+    """Écrit la page statique publiée sur GitHub Pages (remplacement atomique)."""
+    os.makedirs("public", exist_ok=True)
+    tmp = Path("public/index.html.tmp")
+    tmp.write_bytes(html.encode("utf-8"))
+    tmp.replace("public/index.html")
+    print("\n[*] Page HTML générée dans public/index.html")
 
 
 # ── Scan principal ───────────────────────────────────────────────────────────
 
-def main():
+async def main(force_refresh=False):
     print("=" * 60)
     print("  FAC-HABITAT Monitor — Île-de-France")
     print("=" * 60)
 
-    residences = get_idf_residences()
-    print(f"[*] {len(residences)} résidences IDF trouvées\n")
+    load_caches()
 
-    previous_state = load_previous_state()
-    current_state = {}
-    all_results = []
-    new_availabilities = []
+    async with open_session() as session:
+        residences = await get_idf_residences(session, force_refresh)
+        residences = [r for r in residences if "logifac" not in r["nom"].lower()]
+        print(f"[*] {len(residences)} résidences IDF trouvées\n")
+        outcomes = await scan(residences, session)
 
-    for i, res in enumerate(residences, 1):
-        label = f"{res['nom']} ({res['ville']})"
-        print(f"  [{i:2d}/{len(residences)}] {label}...", end=" ", flush=True)
+        previous_state = load_previous_state()
+        current_state = {}
+        all_results = []
+        new_availabilities = []
 
-        try:
-            iframe_url = get_iframe_url(res["id"])
-            if not iframe_url:
+        for i, (res, outcome) in enumerate(zip(residences, outcomes), 1):
+            label = f"{res['nom']} ({res['ville']})"
+            print(f"  [{i:2d}/{len(residences)}] {label}...", end=" ", flush=True)
+
+            if isinstance(outcome, Exception):
+                print(f"erreur: {outcome}")
+                all_results.append((res, []))
+                continue
+
+            if outcome is None:
                 print("skip (pas d'iframe)")
                 all_results.append((res, []))
                 continue
 
-            logements = check_availability(iframe_url)
+            logements = outcome
             all_results.append((res, logements))
 
             for l in logements:
@@ -345,51 +307,27 @@ def main():
             else:
                 print("indisponible")
 
-        except Exception as e:
-            print(f"erreur: {e}")
-            all_results.append((res, []))
+        # ── Sauvegarder l'état ──
+        save_state(current_state)
+        save_caches()
 
-        time.sleep(0.5)
+        # ── Générer la page HTML ──
+        scan_time = datetime.now(timezone.utc).strftime("%d/%m/%Y %H:%M UTC")
+        html = generate_html(all_results, scan_time)
 
-    # ── Sauvegarder l'état ──
-    save_state(current_state)
+        # ── Préparer les notifications Telegram ──
+        messages = []
+        if new_availabilities:
+            print(f"\n[!] {len(new_availabilities)} NOUVELLE(S) DISPONIBILITÉ(S) !")
+            messages = build_messages(new_availabilities)
+        else:
+            print("\n[*] Pas de nouvelle disponibilité depuis le dernier scan.")
 
-    # ── Générer la page HTML ──
-    scan_time = datetime.now(timezone.utc).strftime("%d/%m/%Y %H:%M UTC")
-    html = generate_html(all_results, scan_time)
-    os.makedirs("public", exist_ok=True)
-    with open("public/index.html", "w", encoding="utf-8") as f:
-        f.write(html)
-    print(f"\n[*] Page HTML générée dans public/index.html")
-
-    # ── Envoyer les notifications Telegram ──
-    if new_availabilities:
-        print(f"\n[!] {len(new_availabilities)} NOUVELLE(S) DISPONIBILITÉ(S) !")
-
-        msg = "<b>🏠 FAC-HABITAT — Changement détecté !</b>\n\n"
-        for a in new_availabilities:
-            status_map = {
-                "DISPONIBLE": ("🟢", "Dispo immédiate"),
-                "DEPOSER_DEMANDE": ("🔵", "Demande ouverte"),
-                "DEMANDE_POSSIBLE": ("🟡", "Demande possible"),
-            }
-            emoji, status_txt = status_map.get(a["status"], ("⚪", a["status"]))
-            prev_map = {
-                "INDISPONIBLE": "Indisponible",
-                "DEMANDE_POSSIBLE": "Demande possible",
-                "DEPOSER_DEMANDE": "Demande ouverte",
-            }
-            prev_txt = prev_map.get(a.get("prev_status", ""), "?")
-            msg += (
-                f"{emoji} <b>{a['residence']}</b> — {a['ville']}\n"
-                f"   {a['type']} | {a['loyer']}\n"
-                f"   {prev_txt} → <b>{status_txt}</b>\n"
-                f"   <a href=\"{a['url']}\">Voir / Réserver</a>\n\n"
-            )
-
-        send_telegram(msg)
-    else:
-        print("\n[*] Pas de nouvelle disponibilité depuis le dernier scan.")
+        # ── Écrire la page HTML et notifier en parallèle ──
+        await asyncio.gather(
+            send_telegram(session, messages),
+            asyncio.to_thread(write_html, html),
+        )
 
     # ── Résumé console ──
     nb_dispo = sum(1 for _, l in all_results if any(x["status"] == "DISPONIBLE" for x in l))
@@ -398,4 +336,10 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Moniteur FAC-HABITAT pour GitHub Actions")
+    parser.add_argument(
+        "--force-refresh", action="store_true",
+        help="Ignorer le cache de la liste des résidences"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(force_refresh=args.force_refresh))